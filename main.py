@@ -1,28 +1,381 @@
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse
-from typing import List, Dict, Any, Set, Generator, AsyncGenerator
-import requests
-from bs4 import BeautifulSoup
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from typing import List, Dict, Any, Set, Tuple, AsyncGenerator, Optional, Union
+import aiohttp
+from aiohttp_client_cache import CachedSession, SQLiteBackend
+from rbloom import Bloom
+from sse_starlette.sse import EventSourceResponse
+from lxml import etree
+from lxml import html as lxml_html
 import uuid
 from datetime import datetime, timezone
-from urllib.parse import urljoin, urlparse, urlunparse, parse_qs, urlencode
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qs, parse_qsl, urlencode
 import logging
-from pydantic import BaseModel
+from logging.handlers import QueueHandler, QueueListener
+import queue
+from pydantic import BaseModel, Field, HttpUrl
 import uvicorn
 import os
-import json
+import orjson
 import asyncio
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import aclosing, asynccontextmanager
+from functools import lru_cache
+from collections import Counter, OrderedDict
+import math
+from hashlib import blake2b
 import trafilatura
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Very obvious navigation elements removed before extracting content (not aggressive)
+# Matching on the attribute axis only visits nodes that carry the attribute, which is
+# several times faster than testing every element against one big predicate
+OBVIOUS_NAV_XPATH = etree.XPath(
+    '//nav'
+    ' | //@role[. = "navigation" or . = "banner" or . = "contentinfo"]/..'
+    ' | //@id[. = "skip-link" or . = "skip-to-content"]/..'
+    ' | //@class[contains(., "skip-")'
+    ' and (contains(concat(" ", normalize-space(.), " "), " skip-link ")'
+    ' or contains(concat(" ", normalize-space(.), " "), " skip-to-content "))]/..'
+)
+# Text nodes only, so comments never leak into the extracted content
+TEXT_NODES_XPATH = etree.XPath('.//text()', smart_strings=False)
+# Anchor targets as plain strings (smart strings would keep a reference back into the tree)
+ANCHOR_HREFS_XPATH = etree.XPath('//a/@href', smart_strings=False)
+XML_DECLARATION_RE = re.compile(r'^\s*<\?xml[^>]*\?>')
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset', re.I)
+# Boilerplate phrases stripped from extracted content, applied in this order
+UNWANTED_PHRASES = (
+    "Skip to main content", "Skip to content", "Jump to navigation",
+    "Contribute my reading data to research", "Help Improve arXiv",
+    "arXiv is working with academic researchers",
+    "By clicking 'I agree' below, you consent",
+    "Reading data will never be shared publicly",
+    "We gratefully acknowledge support from",
+    "the Simons Foundation, member institutions , and all contributors. Donate",
+    "cs.HC Help | open search GO open navigation menu",
+    "Login Help Pages About", "Advanced Search All fields",
+    "open search GO open navigation menu quick links",
+    "I Agree Opt Out Close", "Status Login Help",
+    "Title Author Abstract Comments Journal reference",
+    "ACM classification MSC classification Report number",
+    "arXiv identifier DOI ORCID arXiv author ID Help pages Full text Search",
+)
+# Absolute http(s) URL with a host, and any absolute URL, for telling bad schemes from bad syntax
+HTTP_URL_RE = re.compile(r'https?://[^\s/?#]', re.I)
+ABSOLUTE_URL_RE = re.compile(r'[a-z][a-z0-9+.-]*://[^\s/?#]', re.I)
+# Links that never lead to a crawlable page
+SKIP_HREF_RE = re.compile(r'(?:#|mailto:|tel:|javascript:|data:)', re.I)
+# Links to binary files that are never HTML, dropped before they cost a request and a connection.
+# Text formats such as .js or .xml also end page slugs (/wiki/Node.js), so the Content-Type check handles them.
+NON_HTML_URL_RE = re.compile(
+    r'[^:/?#]+://[^/?#]*/[^?#]*\.(?:pdf|jpe?g|png|gif|webp|ico|bmp|tiff?|zip|gz|tgz|rar|7z'
+    r'|mp3|mp4|m4a|wav|ogg|avi|mkv|webm|docx?|xlsx?|pptx?|exe|dmg|apk|woff2?|ttf|eot)(?:[?#]|$)',
+    re.I,
+)
+# Click-tracking query parameters that only make the same page look like a new URL
+TRACKING_QUERY_RE = re.compile(r'(?:^|&)(?:utm_[^=&]*|fbclid|gclid|msclkid)=[^&]*', re.I)
+# Query parameters ignored when deciding whether two URLs are the same page
+DEDUP_TRACKING_PARAMS = frozenset({
+    'utm_source', 'utm_medium', 'utm_campaign', 'utm_content', 'utm_term',
+    'fbclid', 'gclid', 'ref', 'source', '_ga', '_gl', 'mc_cid', 'mc_eid',
+    'campaign', 'medium', 'content', 'term', 'msclkid', 'wbraid', 'gbraid',
+})
+
+# Crawls allowed more pages than this track URLs in Bloom filters instead of sets
+BLOOM_FILTER_MIN_PAGES = 100_000
+BLOOM_FALSE_POSITIVE_RATE = 1e-7
+
+# Page events with more content than this are JSON-encoded in a worker thread
+SSE_THREAD_ENCODE_CHARS = 256 * 1024
+# Seconds between keep-alive comments, so proxies do not time out a slow crawl's stream
+SSE_PING_INTERVAL = 15
+# EventSourceResponse sets the SSE headers itself; browsers on other origins still need CORS
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST",
+    "Access-Control-Allow-Headers": "Content-Type"
+}
+
+# Number of pages fetched in parallel by a single crawl, and the most a caller may ask for
+DEFAULT_CONCURRENCY = 10
+MAX_CONCURRENCY = 64
+# Seconds a resolved host is reused by a crawl's connection pool (aiohttp's default is 10)
+DNS_CACHE_TTL = 300
+# Connections the server-wide HTTP session keeps across all crawls running at once
+HTTP_POOL_LIMIT = 4 * MAX_CONCURRENCY
+
+# Transient failures retried with exponential backoff before a page is reported as an error
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.2
+# Longest Retry-After a crawl worker will wait for, in seconds
+MAX_RETRY_AFTER = 10
+
+# Pages announcing more than this are skipped without downloading them
+MAX_HTML_BYTES = 5_000_000
+# Only this much of a page is read and parsed; article text lives well within it
+MAX_PARSE_BYTES = 2_000_000
+READ_CHUNK_SIZE = 64 * 1024
+
+# On-disk HTTP cache so repeated crawls of the same site skip unchanged pages. Off unless
+# SCRAPE_CACHE names the SQLite file, since every cached page costs a full read and a write
+CACHE_NAME = os.environ.get('SCRAPE_CACHE', 'scrape_cache')
+CACHE_ENABLED = 'SCRAPE_CACHE' in os.environ
+CACHE_EXPIRE_AFTER = 3600  # seconds
+# Extraction results kept for unchanged pages, so cache hits and re-crawls skip parsing
+PARSED_PAGE_CACHE_SIZE = 512
+# ...and at most this much extracted text in total, since a single page may carry megabytes of it
+PARSED_PAGE_CACHE_CHARS = 32_000_000
+
+# Path segments that identify one record of a templated route (UUIDs, numeric IDs, hashes)
+UUID_SEGMENT_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.I)
+NUMERIC_SEGMENT_RE = re.compile(r'\d+')
+HEX_SEGMENT_RE = re.compile(r'[0-9a-f]{16,}', re.I)
+# Query parameters that change on every request without changing the page (sessions, cache busters)
+VOLATILE_QUERY_KEYS = frozenset({'token', 'session', 'sessionid', 'sid', 'ts', '_', 'cb'})
+MAX_QUERY_VALUE_ENTROPY = 4.0  # bits per character; random tokens score above this
+# Entropy is at most log2(len), so shorter values can never exceed the limit
+MIN_HIGH_ENTROPY_LENGTH = 2 ** int(MAX_QUERY_VALUE_ENTROPY) + 1
+
+def shannon_entropy(value: str) -> float:
+    """Shannon entropy of a string in bits per character"""
+    if not value:
+        return 0.0
+    length = len(value)
+    return -sum(count / length * math.log2(count / length) for count in Counter(value).values())
+
+def is_volatile_query_value(value: str) -> bool:
+    """Whether a query value looks like a random token rather than meaningful input"""
+    return len(value) >= MIN_HIGH_ENTROPY_LENGTH and shannon_entropy(value) > MAX_QUERY_VALUE_ENTROPY
+
+@lru_cache(maxsize=50_000)
+def url_fingerprint(url: str, collapse_path_ids: bool = False, drop_random_query_values: bool = False) -> str:
+    """Reduce a URL to a key shared by URLs that only differ in volatile parts"""
+    parsed = urlparse(url)
+    
+    path = parsed.path
+    if collapse_path_ids:
+        segments = []
+        for segment in path.split('/'):
+            if UUID_SEGMENT_RE.fullmatch(segment):
+                segment = '{uuid}'
+            elif NUMERIC_SEGMENT_RE.fullmatch(segment):
+                segment = '{id}'
+            elif HEX_SEGMENT_RE.fullmatch(segment):
+                segment = '{hash}'
+            segments.append(segment)
+        path = '/'.join(segments)
+    
+    query_params = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in VOLATILE_QUERY_KEYS
+        and not key.lower().startswith('utm_')
+        and not (drop_random_query_values and is_volatile_query_value(value))
+    )
+    return urlunparse((parsed.scheme, parsed.netloc.lower(), path, parsed.params, urlencode(query_params), ''))
+
+@lru_cache(maxsize=32)
+def html_parser_for(encoding: str) -> lxml_html.HTMLParser:
+    """HTML parser that decodes input bytes with the given charset"""
+    return lxml_html.HTMLParser(encoding=encoding)
+
+def utc_timestamp() -> str:
+    """Current UTC time as an ISO 8601 string with a Z suffix"""
+    return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+def url_key(url: str) -> int:
+    """64-bit digest standing in for a URL in the crawl's sets, a fraction of the string's size"""
+    return int.from_bytes(blake2b(url.encode(), digest_size=8).digest(), 'little')
+
+@lru_cache(maxsize=50_000)
+def url_netloc(url: str) -> str:
+    """Lowercased network location of a URL, memoised because menus and footers repeat the same links on every page"""
+    return urlparse(url).netloc.lower()
+
+@lru_cache(maxsize=50_000)
+def normalized_url(url: str) -> str:
+    """Normalize URL by removing fragments and tracking parameters"""
+    try:
+        parsed = urlparse(url)
+        # Remove fragment and tracking parameters, then normalize
+        query = TRACKING_QUERY_RE.sub('', parsed.query).lstrip('&') if parsed.query else parsed.query
+        normalized = urlunparse((
+            parsed.scheme,
+            parsed.netloc,
+            parsed.path.rstrip('/') if parsed.path != '/' else parsed.path,
+            parsed.params,
+            query,
+            ''  # Remove fragment
+        ))
+        return normalized
+    except Exception:
+        return url
+
+def dedup_url(url: str) -> str:
+    """Enhanced URL normalization for better duplicate detection"""
+    try:
+        # Lowercasing the whole URL up front also lowercases every query key
+        parsed = urlparse(url.lower().strip())
+        
+        # Keep only meaningful parameters, filter out tracking
+        filtered_params = {
+            key: value for key, value in parse_qs(parsed.query).items()
+            if key not in DEDUP_TRACKING_PARAMS
+        }
+        
+        # Rebuild URL without tracking parameters
+        filtered_query = urlencode(filtered_params, doseq=True)
+        deduplicated = urlunparse((
+            parsed.scheme,
+            parsed.netloc,
+            parsed.path.rstrip('/'),  # Remove trailing slash
+            parsed.params,
+            filtered_query,
+            ''  # Remove fragment
+        ))
+        
+        return deduplicated
+        
+    except Exception as e:
+        logger.error(f"Error normalizing URL for deduplication {url}: {e}")
+        return url.lower().strip()
+
+@lru_cache(maxsize=50_000)
+def dedup_key(url: str) -> int:
+    """url_key() of the deduplicated URL, memoised because the same links are checked from every page that has them"""
+    return url_key(dedup_url(url))
+
+def is_cacheable_page(response: aiohttp.ClientResponse) -> bool:
+    """Cache only HTML known to fit the parse cap, since storing a response reads its whole body"""
+    if 'text/html' not in response.headers.get('content-type', '').lower():
+        return False
+    # Without a Content-Length (chunked bodies) the size is unknown until it has all been read
+    return response.content_length is not None and response.content_length <= MAX_PARSE_BYTES
+
+# Title, content and links of recently parsed pages, keyed by (url, body version)
+_parsed_pages: "OrderedDict[Tuple[str, str], Tuple[str, str, frozenset]]" = OrderedDict()
+_parsed_pages_chars = 0
+
+def parsed_page_key(url: str, response: aiohttp.ClientResponse) -> Optional[Tuple[str, str]]:
+    """Key identifying this exact version of a page's body, None when the version cannot be told"""
+    validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+    if validator:
+        return url, validator
+    if getattr(response, 'from_cache', False):
+        # A cached body never changes until the entry is replaced, which resets created_at
+        return url, f"cached:{response.created_at.isoformat()}"
+    return None
+
+def remember_parsed_page(key: Tuple[str, str], page_data: Dict[str, Any], links: Set[str]) -> None:
+    """Store a page's extraction result, evicting the least recently used ones when full"""
+    global _parsed_pages_chars
+    if key in _parsed_pages:
+        _parsed_pages_chars -= len(_parsed_pages.pop(key)[1])
+    _parsed_pages[key] = (page_data["title"], page_data["content"], frozenset(links))
+    _parsed_pages_chars += len(page_data["content"])
+    while len(_parsed_pages) > PARSED_PAGE_CACHE_SIZE or _parsed_pages_chars > PARSED_PAGE_CACHE_CHARS:
+        _parsed_pages_chars -= len(_parsed_pages.popitem(last=False)[1][1])
+
+def new_http_connector(limit: int, limit_per_host: int) -> aiohttp.TCPConnector:
+    """Pool of keep-alive connections for crawl sessions"""
+    # A crawl stays on one host, so its DNS answer is kept for the length of a typical crawl
+    return aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host, ttl_dns_cache=DNS_CACHE_TTL)
+
+def new_http_session(connector: aiohttp.BaseConnector, timeout: int, use_cache: bool = False,
+                     connector_owner: bool = True) -> aiohttp.ClientSession:
+    """HTTP session over the given connection pool, backed by the SQLite response cache if requested"""
+    session_kwargs = dict(
+        connector=connector,
+        connector_owner=connector_owner,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        # Each session keeps its own cookies, so one crawl's logins and tracking state never reach
+        # another's requests; IP-address hosts are allowed to set them, as they are with requests
+        cookie_jar=aiohttp.CookieJar(unsafe=True),
+        # Set user agent to avoid blocking
+        headers={
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            # Only HTML is scraped; servers that negotiate can skip sending anything else
+            'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.1'
+        }
+    )
+    if use_cache:
+        cache = SQLiteBackend(
+            cache_name=CACHE_NAME,
+            expire_after=CACHE_EXPIRE_AFTER,
+            allowed_methods=('GET', 'HEAD'),
+            cache_control=True,  # Honour Cache-Control/Expires from the site
+            filter_fn=is_cacheable_page,
+        )
+        return CachedSession(cache=cache, **session_kwargs)
+    return aiohttp.ClientSession(**session_kwargs)
+
+# One connection pool for the whole server, so repeat crawls of a site reuse its open connections
+_http_connector: Optional[aiohttp.TCPConnector] = None
+
+def get_http_connector() -> aiohttp.TCPConnector:
+    """Return the server-wide connection pool, creating it on first use"""
+    global _http_connector
+    if _http_connector is None or _http_connector.closed:
+        _http_connector = new_http_connector(HTTP_POOL_LIMIT, MAX_CONCURRENCY)
+    return _http_connector
+
+# Worker processes that parse HTML off the event loop and outside the GIL
+PARSE_WORKERS = os.cpu_count() or 1
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Return the shared HTML parsing process pool, creating it on first use"""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+    return _parse_pool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the parse workers with the server and release shared resources when it shuts down"""
+    # One trivial job per worker forks them all now, before any request has started helper
+    # threads, instead of on the first pages of the first crawl
+    pool = get_parse_pool()
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(pool, int) for _ in range(PARSE_WORKERS)))
+    # Handlers write to stderr on a background thread so crawl workers never block on logging.
+    # Installed after the fork so the parse workers keep writing directly.
+    root_logger = logging.getLogger()
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    log_listener = QueueListener(log_queue, *root_logger.handlers, respect_handler_level=True)
+    root_handlers = root_logger.handlers[:]
+    root_logger.handlers = [QueueHandler(log_queue)]
+    log_listener.start()
+    yield
+    # Flushes whatever is still queued before the original handlers take over again
+    log_listener.stop()
+    root_logger.handlers = root_handlers
+    global _http_connector, _parse_pool
+    if _http_connector is not None:
+        await _http_connector.close()
+        _http_connector = None
+    if _parse_pool is not None:
+        _parse_pool.shutdown(cancel_futures=True)
+        _parse_pool = None
+
+class OrjsonResponse(JSONResponse):
+    """JSON response rendered with orjson, which is much faster than the stdlib on large crawls"""
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
 app = FastAPI(
     title="Web Scraping API",
     description="A FastAPI-based web scraping API that crawls websites and extracts article content - Made by Eng: Amr Hossam",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=OrjsonResponse,
+    lifespan=lifespan
 )
 
 # Mount static files
@@ -33,72 +386,156 @@ class ScrapedPage(BaseModel):
     """Model for scraped page data"""
     data: Dict[str, Any]
 
+class StreamScrapeRequest(BaseModel):
+    """Request body for the unlimited streaming endpoint"""
+    url: HttpUrl  # Only well-formed http(s) URLs are accepted
+    timeout: int = Field(10, ge=1, le=60)
+    concurrency: int = Field(DEFAULT_CONCURRENCY, ge=1, le=MAX_CONCURRENCY)
+    collapse_path_ids: bool = False
+    drop_random_query_values: bool = False
+
+class LimitedStreamScrapeRequest(StreamScrapeRequest):
+    """Request body for the page-limited streaming endpoint"""
+    max_pages: int = Field(50, ge=1, le=999999)
+
 class WebScraper:
-    def __init__(self, base_url: str, timeout: int = 10, max_pages: int = 100, callback=None):
+    def __init__(self, base_url: str, timeout: int = 10, max_pages: int = 100, callback=None,
+                 concurrency: int = DEFAULT_CONCURRENCY, collapse_path_ids: bool = False,
+                 drop_random_query_values: bool = False, use_cache: bool = CACHE_ENABLED,
+                 connector: Optional[aiohttp.BaseConnector] = None):
         self.base_url = base_url
         self.timeout = timeout
         self.max_pages = max_pages
-        self.visited_urls: Set[str] = set()
-        self.session = requests.Session()
+        self.concurrency = concurrency
+        self.use_cache = use_cache
+        # Treat /item/1 and /item/2 as the same page; only safe for sites whose records share content
+        self.collapse_path_ids = collapse_path_ids
+        # Ignore query values that look like random tokens; slugs and wiki titles can score as
+        # random too, so this is only safe for sites known to put cache busters in the query
+        self.drop_random_query_values = drop_random_query_values
+        # URL sets hold url_key() digests rather than the strings themselves
+        self.visited_urls = self._new_url_key_set()
+        # Every URL ever queued by crawl_website, claimed at enqueue time so each is queued once
+        self.seen_urls = self._new_url_key_set()
+        self.seen_fingerprints = self._new_url_key_set()
         self.callback = callback  # Callback function for streaming results
-        
-        # Set user agent to avoid blocking
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        # A connection pool passed in belongs to the caller and stays open when the scraper closes
+        self._connector = connector
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._frontier: Optional[asyncio.Queue] = None
         
         # Parse base URL to get domain
         parsed_url = urlparse(base_url)
         self.domain = parsed_url.netloc
         self.scheme = parsed_url.scheme
+        # Host names accepted as the same site, so is_same_domain is a single set lookup
+        bare_domain = self.domain.lower().removeprefix("www.")
+        self._domain_variants = frozenset({bare_domain, f"www.{bare_domain}"})
+    
+    def _new_url_key_set(self) -> Union[Set[int], Bloom]:
+        """Empty set of url_key() digests, a Bloom filter for very large crawls"""
+        # A false positive only skips one page, a fair price for a structure ~15x smaller than a set of int keys
+        if self.max_pages > BLOOM_FILTER_MIN_PAGES:
+            return Bloom(self.max_pages, BLOOM_FALSE_POSITIVE_RATE)
+        return set()
+    
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """HTTP session, created lazily so parse-only instances never open one"""
+        if self._session is None:
+            if self._connector is not None:
+                self._session = new_http_session(self._connector, self.timeout, self.use_cache, connector_owner=False)
+            else:
+                connector = new_http_connector(self.concurrency * 2, self.concurrency)
+                self._session = new_http_session(connector, self.timeout, self.use_cache)
+        return self._session
+    
+    async def __aenter__(self) -> "WebScraper":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
+    async def close(self) -> None:
+        """Close the HTTP session, and its pooled connections unless the caller provided them"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
     
     def is_same_domain(self, url: str) -> bool:
         """Check if URL belongs to the same domain"""
         try:
-            parsed = urlparse(url)
-            return parsed.netloc == self.domain or parsed.netloc == f"www.{self.domain}" or parsed.netloc == self.domain.replace("www.", "")
+            return url_netloc(url) in self._domain_variants
         except Exception:
             return False
     
     def normalize_url(self, url: str) -> str:
-        """Normalize URL by removing fragments and sorting query parameters"""
+        """Normalize URL by removing fragments and tracking parameters"""
+        return normalized_url(url)
+    
+    @staticmethod
+    def parse_html(html_content: Union[str, bytes], encoding: Optional[str] = None) -> lxml_html.HtmlElement:
+        """Parse HTML into an lxml document tree"""
+        parser = None
+        # Parse cost grows with size, so very large documents are cut to the cap
+        html_content = html_content[:MAX_PARSE_BYTES]
+        if isinstance(html_content, bytes):
+            # Bytes go straight to libxml2, which decodes them without building a Python str
+            if encoding:
+                try:
+                    parser = html_parser_for(encoding.lower())
+                except LookupError:
+                    # Unknown charset name, treat the page as if nothing was declared
+                    encoding = None
+            if encoding is None and not html_content.isascii() and not META_CHARSET_RE.search(html_content, 0, 4096):
+                # Nothing declared: prefer UTF-8 over libxml2's Latin-1 default when the bytes allow it
+                try:
+                    html_content.decode('utf-8')
+                    encoding = 'utf-8'
+                except UnicodeDecodeError as e:
+                    if e.reason == 'unexpected end of data':
+                        # Only the last character was cut off by the size cap
+                        encoding = 'utf-8'
+                if encoding:
+                    parser = html_parser_for(encoding)
+        
         try:
-            parsed = urlparse(url)
-            # Remove fragment and normalize
-            normalized = urlunparse((
-                parsed.scheme,
-                parsed.netloc,
-                parsed.path.rstrip('/') if parsed.path != '/' else parsed.path,
-                parsed.params,
-                parsed.query,
-                ''  # Remove fragment
-            ))
-            return normalized
-        except Exception:
-            return url
+            return lxml_html.document_fromstring(html_content, parser=parser)
+        except ValueError:
+            # lxml refuses str input that still carries an XML encoding declaration
+            return lxml_html.document_fromstring(XML_DECLARATION_RE.sub('', html_content, count=1))
+        except etree.ParserError:
+            # Empty document
+            return lxml_html.Element('html')
     
-    def extract_links(self, html_content: str, base_url: str) -> Set[str]:
+    def extract_links(self, html_content: Union[str, bytes], base_url: str, encoding: Optional[str] = None) -> Set[str]:
         """Extract all internal links from HTML content"""
+        try:
+            tree = self.parse_html(html_content, encoding)
+        except Exception as e:
+            logger.error(f"Error extracting links: {e}")
+            return set()
+        return self._extract_links_from_tree(tree, base_url)
+    
+    def _extract_links_from_tree(self, tree: lxml_html.HtmlElement, base_url: str, filter_duplicates: bool = True) -> Set[str]:
+        """Extract all internal links from an already parsed document"""
         links = set()
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
             # Find all anchor tags with href attributes
-            for link in soup.find_all('a', href=True):
-                href_attr = link.get('href')
-                if not href_attr:
-                    continue
-                href = str(href_attr).strip()
-                if not href or href.startswith('#') or href.startswith('mailto:') or href.startswith('tel:'):
+            for href_attr in ANCHOR_HREFS_XPATH(tree):
+                href = href_attr.strip()
+                if not href or SKIP_HREF_RE.match(href):
                     continue
                 
                 # Convert relative URLs to absolute
                 absolute_url = urljoin(base_url, href)
                 
-                # Check if it's the same domain and not duplicate
-                if self.is_same_domain(absolute_url) and not self.is_duplicate_url(absolute_url):
-                    normalized_url = self.normalize_url(absolute_url)
-                    links.add(normalized_url)
+                # Check if it's the same domain, an HTML page and not duplicate
+                if not self.is_same_domain(absolute_url) or NON_HTML_URL_RE.match(absolute_url):
+                    continue
+                if not filter_duplicates or not self.is_duplicate_url(absolute_url):
+                    link_url = self.normalize_url(absolute_url)
+                    links.add(link_url)
         
         except Exception as e:
             logger.error(f"Error extracting links: {e}")
@@ -107,112 +544,82 @@ class WebScraper:
     
     def normalize_url_for_deduplication(self, url: str) -> str:
         """Enhanced URL normalization for better duplicate detection"""
-        try:
-            parsed = urlparse(url.lower().strip())
-            
-            # Remove common tracking parameters
-            query_params = parse_qs(parsed.query)
-            filtered_params = {}
-            
-            # Keep only meaningful parameters, filter out tracking
-            tracking_params = {'utm_source', 'utm_medium', 'utm_campaign', 'utm_content', 'utm_term', 
-                             'fbclid', 'gclid', 'ref', 'source', '_ga', '_gl', 'mc_cid', 'mc_eid',
-                             'campaign', 'medium', 'content', 'term', 'msclkid', 'wbraid', 'gbraid'}
-            
-            for key, value in query_params.items():
-                if key.lower() not in tracking_params:
-                    filtered_params[key] = value
-            
-            # Rebuild URL without tracking parameters
-            filtered_query = urlencode(filtered_params, doseq=True)
-            normalized_url = urlunparse((
-                parsed.scheme,
-                parsed.netloc,
-                parsed.path.rstrip('/'),  # Remove trailing slash
-                parsed.params,
-                filtered_query,
-                ''  # Remove fragment
-            ))
-            
-            return normalized_url
-            
-        except Exception as e:
-            logger.error(f"Error normalizing URL for deduplication {url}: {e}")
-            return url.lower().strip()
+        return dedup_url(url)
+    
+    def claim_fingerprint(self, url: str) -> bool:
+        """Record the URL's fingerprint, returning False if an equivalent URL was already seen"""
+        fingerprint = url_key(url_fingerprint(url, self.collapse_path_ids, self.drop_random_query_values))
+        if fingerprint in self.seen_fingerprints:
+            return False
+        self.seen_fingerprints.add(fingerprint)
+        return True
     
     def is_duplicate_url(self, url: str) -> bool:
         """Check if URL is duplicate using enhanced normalization"""
-        normalized = self.normalize_url_for_deduplication(url)
-        return normalized in self.visited_urls
+        return dedup_key(url) in self.visited_urls
     
-    def extract_content(self, html_content: str, url: str) -> Dict[str, Any]:
+    def extract_content(self, html_content: Union[str, bytes], url: str, encoding: Optional[str] = None) -> Dict[str, Any]:
         """Extract title and content from HTML - keeps all content but removes only unwanted navigation elements"""
         try:
-            # Use BeautifulSoup for content extraction
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
+            tree = self.parse_html(html_content, encoding)
+        except Exception as e:
+            return self._content_error(url, e)
+        return self._extract_content_from_tree(tree, url)
+    
+    def _content_error(self, url: str, error: Exception) -> Dict[str, Any]:
+        """Build the page record returned when content extraction fails"""
+        logger.error(f"Error extracting content from {url}: {error}")
+        return {
+            "created_at": utc_timestamp(),
+            "id": uuid.uuid4().hex,
+            "source_url": url,
+            "title": "",
+            "content": f"Error extracting content: {str(error)}"
+        }
+    
+    def _extract_content_from_tree(self, tree: lxml_html.HtmlElement, url: str) -> Dict[str, Any]:
+        """Extract title and content from an already parsed document (mutates the tree)"""
+        try:
             # Extract title
             title = ""
-            title_tag = soup.find('title')
-            if title_tag:
-                title = title_tag.get_text().strip()
+            # The head is tiny; './/title' would walk the whole document looking ahead for a second match
+            title_tag = tree.find('head/title')
+            if title_tag is None:
+                title_tag = tree.find('.//title')
+            if title_tag is not None:
+                title = title_tag.text_content().strip()
             else:
-                h1_tag = soup.find('h1')
-                if h1_tag:
-                    title = h1_tag.get_text().strip()
+                h1_tag = tree.find('.//h1')
+                if h1_tag is not None:
+                    title = h1_tag.text_content().strip()
             
             # Remove only script, style, and obvious navigation/menu elements
             # Keep everything else to ensure we don't miss any content
-            for element in soup(["script", "style"]):
-                element.decompose()
-            
-            # Remove only very obvious navigation elements (not aggressive)
-            obvious_nav_selectors = [
-                'nav', 'header[role="banner"]', 'footer[role="contentinfo"]',
-                '[role="navigation"]', '[role="banner"]', '[role="contentinfo"]',
-                '.skip-link', '.skip-to-content', '#skip-link', '#skip-to-content'
-            ]
+            etree.strip_elements(tree, 'script', 'style', with_tail=False)
             
-            for selector in obvious_nav_selectors:
-                for element in soup.select(selector):
-                    element.decompose()
+            for element in OBVIOUS_NAV_XPATH(tree):
+                # drop_tree() keeps the element's tail text but needs a parent to detach from
+                if element.getparent() is not None:
+                    element.drop_tree()
             
             # Extract complete page content from body
-            body = soup.find('body')
-            if body:
-                content = body.get_text(separator=' ', strip=True)
-            else:
-                content = soup.get_text(separator=' ', strip=True)
+            body = tree.find('body')
+            text_nodes = TEXT_NODES_XPATH(body if body is not None else tree)
+            # map/filter keep the strip-and-skip-blank pass in C instead of a generator frame per node
+            content = ' '.join(filter(None, map(str.strip, text_nodes)))
             
             # Clean up content - remove only specific unwanted phrases but keep everything else
             if content:
                 # Remove common navigation phrases that don't contain valuable content
-                unwanted_phrases = [
-                    "Skip to main content", "Skip to content", "Jump to navigation",
-                    "Contribute my reading data to research", "Help Improve arXiv",
-                    "arXiv is working with academic researchers",
-                    "By clicking 'I agree' below, you consent",
-                    "Reading data will never be shared publicly",
-                    "We gratefully acknowledge support from",
-                    "the Simons Foundation, member institutions , and all contributors. Donate",
-                    "cs.HC Help | open search GO open navigation menu",
-                    "Login Help Pages About", "Advanced Search All fields",
-                    "open search GO open navigation menu quick links",
-                    "I Agree Opt Out Close", "Status Login Help",
-                    "Title Author Abstract Comments Journal reference",
-                    "ACM classification MSC classification Report number",
-                    "arXiv identifier DOI ORCID arXiv author ID Help pages Full text Search"
-                ]
-                
-                for phrase in unwanted_phrases:
+                for phrase in UNWANTED_PHRASES:
                     content = content.replace(phrase, " ")
                 
                 # Clean up extra whitespace
                 content = ' '.join(content.split())
             
             # Generate unique ID and timestamp
-            page_id = str(uuid.uuid4())
-            created_at = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+            page_id = uuid.uuid4().hex
+            created_at = utc_timestamp()
             
             return {
                 "created_at": created_at,
@@ -223,96 +630,269 @@ class WebScraper:
             }
         
         except Exception as e:
-            logger.error(f"Error extracting content from {url}: {e}")
-            return {
-                "created_at": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
-                "id": str(uuid.uuid4()),
-                "source_url": url,
-                "title": "",
-                "content": f"Error extracting content: {str(e)}"
-            }
+            return self._content_error(url, e)
     
-    def scrape_page(self, url: str) -> Dict[str, Any]:
+    def _process_page(self, html_content: Union[str, bytes], url: str, encoding: Optional[str] = None) -> Tuple[Dict[str, Any], Set[str]]:
+        """Parse a page once and return both its extracted content and its internal links"""
+        try:
+            tree = self.parse_html(html_content, encoding)
+        except Exception as e:
+            return self._content_error(url, e), set()
+        
+        # Links must be collected first: content extraction strips nav/script nodes.
+        # Duplicate filtering is left to the caller, which owns the crawl state.
+        links = self._extract_links_from_tree(tree, url, filter_duplicates=False)
+        return self._extract_content_from_tree(tree, url), links
+    
+    async def fetch(self, url: str) -> aiohttp.ClientResponse:
+        """GET a URL, retrying dropped connections and gateway errors with backoff"""
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = await self.session.get(url)
+            except aiohttp.ClientConnectionError:
+                if attempt == MAX_RETRIES:
+                    raise
+            else:
+                if response.status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                    return response
+                response.release()
+                # A throttling site says how long to back off; only delay-seconds values are honoured
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    await asyncio.sleep(min(int(retry_after), MAX_RETRY_AFTER))
+                    continue
+            
+            await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+    
+    async def scrape_page(self, url: str) -> Dict[str, Any]:
         """Scrape a single page and return extracted data"""
+        page_data, _ = await self.scrape_page_with_links(url)
+        return page_data
+    
+    async def scrape_page_with_links(self, url: str) -> Tuple[Dict[str, Any], Set[str]]:
+        """Scrape a single page with one request and return extracted data plus discovered links"""
         try:
             logger.info(f"Scraping: {url}")
-            response = self.session.get(url, timeout=self.timeout)
-            response.raise_for_status()
+            async with await self.fetch(url) as response:
+                response.raise_for_status()
+                
+                # Check if content type is HTML
+                content_type = response.headers.get('content-type', '').lower()
+                if 'text/html' not in content_type:
+                    logger.warning(f"Skipping non-HTML content: {url}")
+                    return {
+                        "created_at": utc_timestamp(),
+                        "id": uuid.uuid4().hex,
+                        "source_url": url,
+                        "title": "Non-HTML Content",
+                        "content": "Skipped non-HTML content"
+                    }, set()
+                
+                # Headers arrive before the body, so oversized pages are dropped without downloading them
+                if response.content_length is not None and response.content_length > MAX_HTML_BYTES:
+                    logger.warning(f"Skipping oversized content ({response.content_length} bytes): {url}")
+                    return {
+                        "created_at": utc_timestamp(),
+                        "id": uuid.uuid4().hex,
+                        "source_url": url,
+                        "title": "Oversized Content",
+                        "content": f"Skipped content larger than {MAX_HTML_BYTES} bytes"
+                    }, set()
+                
+                # Unchanged page seen before: reuse its extraction instead of reading and parsing again
+                parse_key = parsed_page_key(url, response)
+                if parse_key in _parsed_pages:
+                    _parsed_pages.move_to_end(parse_key)
+                    title, content, links = _parsed_pages[parse_key]
+                    return {
+                        "created_at": utc_timestamp(),
+                        "id": uuid.uuid4().hex,
+                        "source_url": url,
+                        "title": title,
+                        "content": content
+                    }, {link for link in links if not self.is_duplicate_url(link)}
+                
+                # Stream the body so pages without a Content-Length are still capped
+                chunks = []
+                size = 0
+                async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= MAX_PARSE_BYTES:
+                        logger.warning(f"Truncating content at {MAX_PARSE_BYTES} bytes: {url}")
+                        break
+                # One join builds the final bytes; slicing is free when nothing was cut off
+                html_content = b''.join(chunks)[:MAX_PARSE_BYTES]
+                # Charset declared in the Content-Type header, None when absent
+                encoding = response.charset
             
-            # Check if content type is HTML
-            content_type = response.headers.get('content-type', '').lower()
-            if 'text/html' not in content_type:
-                logger.warning(f"Skipping non-HTML content: {url}")
-                return {
-                    "created_at": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
-                    "id": str(uuid.uuid4()),
-                    "source_url": url,
-                    "title": "Non-HTML Content",
-                    "content": "Skipped non-HTML content"
-                }
+            # Parse in a worker process; raw bytes are decoded there using the declared charset
+            loop = asyncio.get_running_loop()
+            page_data, links = await loop.run_in_executor(
+                get_parse_pool(), process_page_html, self.base_url, html_content, url, encoding
+            )
+            if parse_key is not None:
+                remember_parsed_page(parse_key, page_data, links)
             
-            return self.extract_content(response.text, url)
+            # Workers cannot see visited_urls, so duplicates are filtered here
+            return page_data, {link for link in links if not self.is_duplicate_url(link)}
         
-        except requests.exceptions.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.error(f"Request error for {url}: {e}")
             return {
-                "created_at": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
-                "id": str(uuid.uuid4()),
+                "created_at": utc_timestamp(),
+                "id": uuid.uuid4().hex,
                 "source_url": url,
                 "title": "",
-                "content": f"Request error: {str(e)}"
-            }
+                "content": f"Request error: {str(e) or type(e).__name__}"
+            }, set()
         except Exception as e:
             logger.error(f"Unexpected error for {url}: {e}")
             return {
-                "created_at": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
-                "id": str(uuid.uuid4()),
+                "created_at": utc_timestamp(),
+                "id": uuid.uuid4().hex,
                 "source_url": url,
                 "title": "",
                 "content": f"Unexpected error: {str(e)}"
-            }
+            }, set()
     
-    def crawl_website(self) -> List[Dict[str, Any]]:
-        """Crawl the entire website and return scraped data"""
-        scraped_data = []
-        urls_to_visit = [self.normalize_url(self.base_url)]
+    @property
+    def queue_size(self) -> int:
+        """Number of URLs waiting in the running crawl's frontier"""
+        return self._frontier.qsize() if self._frontier is not None else 0
+    
+    async def crawl_batches(self) -> AsyncGenerator[List[Dict[str, Any]], None]:
+        """Crawl the website with a pool of concurrent workers, yielding the pages scraped so far as soon as any is ready"""
+        urls_to_visit: asyncio.Queue = asyncio.Queue()
+        # Bounded so a slow consumer, such as a stream client on a poor link, pauses the workers
+        # instead of letting finished pages pile up in memory
+        scraped_pages: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        self._frontier = urls_to_visit
+        start_url = self.normalize_url(self.base_url)
+        self.seen_urls.add(url_key(start_url))
+        self.claim_fingerprint(start_url)
+        urls_to_visit.put_nowait(start_url)
+        # Counted separately because a Bloom filter cannot report its size
+        pages_started = 0
+        urls_queued = 1
         
-        while urls_to_visit and len(scraped_data) < self.max_pages:
-            current_url = urls_to_visit.pop(0)
-            
-            # Skip if already visited
-            if current_url in self.visited_urls:
-                continue
-            
-            # Mark as visited
-            self.visited_urls.add(current_url)
-            
-            # Scrape the page
-            page_data = self.scrape_page(current_url)
-            if page_data:
-                scraped_data.append(page_data)
-                
-                # Call callback if streaming is enabled
-                if self.callback:
-                    self.callback(page_data)
-                
-                # Extract links only if we successfully scraped the page
+        async def worker() -> None:
+            nonlocal pages_started, urls_queued
+            while True:
+                current_url = await urls_to_visit.get()
                 try:
-                    response = self.session.get(current_url, timeout=self.timeout)
-                    if response.status_code == 200 and 'text/html' in response.headers.get('content-type', '').lower():
-                        new_links = self.extract_links(response.text, current_url)
+                    # Queued URLs are unique, so only the page budget needs checking here
+                    if pages_started >= self.max_pages:
+                        continue
+                    
+                    pages_started += 1
+                    self.visited_urls.add(url_key(current_url))
+                    
+                    # Scrape the page and collect its links from the same response
+                    page_data, new_links = await self.scrape_page_with_links(current_url)
+                    if page_data:
+                        await scraped_pages.put(page_data)
                         
                         # Add new links to visit queue
                         for link in new_links:
-                            if link not in self.visited_urls and link not in urls_to_visit:
-                                urls_to_visit.append(link)
+                            # Every queued URL is visited, so links past the page budget would only be drained unused
+                            if urls_queued >= self.max_pages:
+                                break
+                            link_key = url_key(link)
+                            if link_key in self.seen_urls or not self.claim_fingerprint(link):
+                                continue
+                            self.seen_urls.add(link_key)
+                            urls_to_visit.put_nowait(link)
+                            urls_queued += 1
                 
                 except Exception as e:
-                    logger.error(f"Error extracting links from {current_url}: {e}")
+                    logger.error(f"Error crawling {current_url}: {e}")
+                finally:
+                    urls_to_visit.task_done()
         
+        async def signal_done() -> None:
+            # Finishes once every queued URL has been processed or skipped
+            await urls_to_visit.join()
+            await scraped_pages.put(None)
+        
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        done = asyncio.create_task(signal_done())
+        try:
+            finished = False
+            while not finished:
+                # Wait for one page, then take every other page that finished meanwhile, so a
+                # burst reaches the consumer in one go without delaying a lone page
+                batch = [await scraped_pages.get()]
+                while not scraped_pages.empty():
+                    batch.append(scraped_pages.get_nowait())
+                # The end marker is queued after every page, so it can only come last
+                if batch[-1] is None:
+                    batch.pop()
+                    finished = True
+                # Call callback if streaming is enabled
+                if self.callback:
+                    for page_data in batch:
+                        self.callback(page_data)
+                if batch:
+                    yield batch
+        finally:
+            # Also reached when the consumer stops early, e.g. a disconnected stream client
+            for task in (done, *workers):
+                task.cancel()
+            await asyncio.gather(done, *workers, return_exceptions=True)
+            self._frontier = None
+    
+    async def crawl_iter(self) -> AsyncGenerator[Dict[str, Any], None]:
+        """Crawl the website with a pool of concurrent workers, yielding each page as soon as it is scraped"""
+        async with aclosing(self.crawl_batches()) as batches:
+            async for batch in batches:
+                for page_data in batch:
+                    yield page_data
+    
+    async def crawl_website(self) -> List[Dict[str, Any]]:
+        """Crawl the entire website and return scraped data"""
+        scraped_data = [page_data async for page_data in self.crawl_iter()]
         logger.info(f"Crawling completed. Scraped {len(scraped_data)} pages.")
         return scraped_data
 
+def process_page_html(base_url: str, html_content: bytes, url: str, encoding: Optional[str] = None) -> Tuple[Dict[str, Any], Set[str]]:
+    """Parse a fetched page for a crawl of base_url (module-level so the process pool can pickle it)"""
+    return WebScraper(base_url)._process_page(html_content, url, encoding)
+
+def validate_url(url: str) -> None:
+    """Reject anything but an absolute http(s) URL with a 400"""
+    if HTTP_URL_RE.match(url):
+        return
+    if ABSOLUTE_URL_RE.match(url):
+        raise HTTPException(status_code=400, detail="Invalid URL: URL must use HTTP or HTTPS protocol")
+    raise HTTPException(status_code=400, detail="Invalid URL: Invalid URL format")
+
+async def iter_json_array(pages: AsyncGenerator[Dict[str, Any], None]) -> AsyncGenerator[bytes, None]:
+    """Yield a JSON array of {"data": page} objects as each page arrives"""
+    separator = b'['
+    async with aclosing(pages):
+        async for page_data in pages:
+            yield separator + orjson.dumps({"data": page_data})
+            separator = b','
+    yield b']' if separator == b',' else b'[]'
+
+def sse_event(event: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Events frame (orjson writes datetimes in isoformat itself)"""
+    return b"data: " + orjson.dumps(event) + b"\n\n"
+
+def sse_start_template(message: str) -> bytes:
+    """Pre-encode a stream's start event, leaving a %s slot for its timestamp"""
+    return sse_event({"type": "start", "message": message, "timestamp": "%s"})
+
+STREAM_START_TEMPLATE = sse_start_template("بدء عملية السكرابنج...")
+UNLIMITED_STREAM_START_TEMPLATE = sse_start_template("بدء عملية السكرابنج الشامل للموقع...")
+
+async def encode_page_event(event: Dict[str, Any]) -> bytes:
+    """Encode a page event, in a thread when its content is large enough to stall the event loop"""
+    if len(event["data"].get("content", "")) > SSE_THREAD_ENCODE_CHARS:
+        return await asyncio.to_thread(sse_event, event)
+    return sse_event(event)
+
 @app.get("/")
 async def root():
     """Serve the main UI"""
@@ -398,23 +978,13 @@ async def scrape_single_page(
     """
     
     # Validate URL
-    try:
-        parsed_url = urlparse(url)
-        if not parsed_url.scheme or not parsed_url.netloc:
-            raise HTTPException(status_code=400, detail="Invalid URL format")
-        
-        if parsed_url.scheme not in ['http', 'https']:
-            raise HTTPException(status_code=400, detail="URL must use HTTP or HTTPS protocol")
-    
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid URL: {str(e)}")
+    validate_url(url)
     
     try:
         # Initialize scraper just to use its scrape_page method
-        scraper = WebScraper(url, timeout=timeout, max_pages=1)
-        
-        # Scrape only the single page
-        page_data = scraper.scrape_page(url)
+        async with WebScraper(url, timeout=timeout, max_pages=1, connector=get_http_connector()) as scraper:
+            # Scrape only the single page
+            page_data = await scraper.scrape_page(url)
         
         if not page_data or not page_data.get('content'):
             raise HTTPException(status_code=404, detail="No content could be extracted from the provided URL")
@@ -443,6 +1013,23 @@ async def scrape_all_pages(
         ge=1, 
         le=60,
         example=10
+    ),
+    concurrency: int = Query(
+        DEFAULT_CONCURRENCY, 
+        description="Number of pages fetched in parallel", 
+        ge=1, 
+        le=MAX_CONCURRENCY,
+        example=DEFAULT_CONCURRENCY
+    ),
+    collapse_path_ids: bool = Query(
+        False, 
+        description="Treat URLs that only differ in numeric, UUID or hash path segments as the same page",
+        example=False
+    ),
+    drop_random_query_values: bool = Query(
+        False, 
+        description="Ignore query values that look like random tokens when comparing URLs",
+        example=False
     )
 ):
     """
@@ -461,6 +1048,9 @@ async def scrape_all_pages(
     ## Parameters:
     - **url**: Base URL of the website to scrape completely
     - **timeout**: Timeout in seconds for each page request
+    - **concurrency**: Number of pages fetched in parallel
+    - **collapse_path_ids**: Crawl only one of /item/1, /item/2, ... (for sites whose records share content)
+    - **drop_random_query_values**: Ignore token-like query values such as cache busters
     
     ## Returns:
     A list of ALL scraped pages from the website, each containing:
@@ -475,41 +1065,47 @@ async def scrape_all_pages(
     """
     
     # Validate URL
-    try:
-        parsed_url = urlparse(url)
-        if not parsed_url.scheme or not parsed_url.netloc:
-            raise HTTPException(status_code=400, detail="Invalid URL format")
-        
-        if parsed_url.scheme not in ['http', 'https']:
-            raise HTTPException(status_code=400, detail="URL must use HTTP or HTTPS protocol")
+    validate_url(url)
     
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid URL: {str(e)}")
+    # Initialize scraper with very high max_pages for unlimited scraping
+    scraper = WebScraper(url, timeout=timeout, max_pages=999999, concurrency=concurrency,
+                         collapse_path_ids=collapse_path_ids,
+                         drop_random_query_values=drop_random_query_values,
+                         connector=get_http_connector())
+    pages = scraper.crawl_iter()
     
     try:
-        # Initialize scraper with very high max_pages for unlimited scraping
-        scraper = WebScraper(url, timeout=timeout, max_pages=999999)
-        
-        # Crawl entire website
-        scraped_data = scraper.crawl_website()
-        
-        if not scraped_data:
-            raise HTTPException(status_code=404, detail="No content could be scraped from the provided URL")
-        
-        # Format response according to specified structure
-        formatted_response = []
-        for page_data in scraped_data:
-            formatted_response.append({
-                "data": page_data
-            })
-        
-        return formatted_response
-    
-    except HTTPException:
-        raise
+        # Wait for the first page before committing to a 200, so an empty crawl can still 404
+        first_page = await anext(pages, None)
     except Exception as e:
+        await pages.aclose()
+        await scraper.close()
         logger.error(f"Error during unlimited scraping: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    
+    if first_page is None:
+        await scraper.close()
+        raise HTTPException(status_code=404, detail="No content could be scraped from the provided URL")
+    
+    async def crawl_pages() -> AsyncGenerator[Dict[str, Any], None]:
+        """Every page of the crawl, starting with the one already taken"""
+        scraped_count = 1
+        try:
+            yield first_page
+            async for page_data in pages:
+                scraped_count += 1
+                yield page_data
+            logger.info(f"Crawling completed. Scraped {scraped_count} pages.")
+        except Exception as e:
+            # The 200 is already sent, so the client sees a truncated array
+            logger.error(f"Error during unlimited scraping: {e}")
+            raise
+        finally:
+            await pages.aclose()
+            await scraper.close()
+    
+    # Each page is sent as soon as it is scraped, so the crawl is never held in memory whole
+    return StreamingResponse(iter_json_array(crawl_pages()), media_type="application/json")
 
 @app.post("/scrape-pages", response_model=List[ScrapedPage], tags=["Web Scraping"])
 async def scrape_website(
@@ -531,6 +1127,23 @@ async def scrape_website(
         ge=1, 
         le=60,
         example=10
+    ),
+    concurrency: int = Query(
+        DEFAULT_CONCURRENCY, 
+        description="Number of pages fetched in parallel", 
+        ge=1, 
+        le=MAX_CONCURRENCY,
+        example=DEFAULT_CONCURRENCY
+    ),
+    collapse_path_ids: bool = Query(
+        False, 
+        description="Treat URLs that only differ in numeric, UUID or hash path segments as the same page",
+        example=False
+    ),
+    drop_random_query_values: bool = Query(
+        False, 
+        description="Ignore query values that look like random tokens when comparing URLs",
+        example=False
     )
 ):
     """
@@ -549,6 +1162,9 @@ async def scrape_website(
     - **url**: Base URL of the website (must start with http or https)
     - **max_pages**: Maximum number of pages to scrape (use 999999+ for unlimited)
     - **timeout**: Timeout in seconds for each page request
+    - **concurrency**: Number of pages fetched in parallel
+    - **collapse_path_ids**: Crawl only one of /item/1, /item/2, ... (for sites whose records share content)
+    - **drop_random_query_values**: Ignore token-like query values such as cache busters
     
     ## Returns:
     A list of scraped pages, each containing:
@@ -563,35 +1179,23 @@ async def scrape_website(
     """
     
     # Validate URL
-    try:
-        parsed_url = urlparse(url)
-        if not parsed_url.scheme or not parsed_url.netloc:
-            raise HTTPException(status_code=400, detail="Invalid URL format")
-        
-        if parsed_url.scheme not in ['http', 'https']:
-            raise HTTPException(status_code=400, detail="URL must use HTTP or HTTPS protocol")
-    
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid URL: {str(e)}")
+    validate_url(url)
     
     try:
         # Initialize scraper
-        scraper = WebScraper(url, timeout=timeout, max_pages=max_pages)
-        
-        # Crawl website
-        scraped_data = scraper.crawl_website()
+        async with WebScraper(url, timeout=timeout, max_pages=max_pages, concurrency=concurrency,
+                              collapse_path_ids=collapse_path_ids,
+                              drop_random_query_values=drop_random_query_values,
+                              connector=get_http_connector()) as scraper:
+            # Crawl website
+            scraped_data = await scraper.crawl_website()
         
         if not scraped_data:
             raise HTTPException(status_code=404, detail="No content could be scraped from the provided URL")
         
-        # Format response according to specified structure
-        formatted_response = []
-        for page_data in scraped_data:
-            formatted_response.append({
-                "data": page_data
-            })
-        
-        return formatted_response
+        # Format response according to specified structure; returning the response directly skips
+        # re-validating every page against response_model, which only documents the shape
+        return OrjsonResponse([{"data": page_data} for page_data in scraped_data])
     
     except HTTPException:
         raise
@@ -624,153 +1228,74 @@ Returns streaming JSON responses with real-time updates.
 {
     "url": "https://example.com",
     "max_pages": 50,
-    "timeout": 10
+    "timeout": 10,
+    "concurrency": 10,
+    "collapse_path_ids": false,
+    "drop_random_query_values": false
 }
 ```
         """)
-async def scrape_website_stream(request: dict):
+async def scrape_website_stream(request: LimitedStreamScrapeRequest):
     
-    # Extract parameters from request
-    url = request.get('url')
-    max_pages = request.get('max_pages', 50)
-    timeout = request.get('timeout', 10)
+    # The body model has already validated every field
+    url = str(request.url)
+    max_pages = request.max_pages
+    timeout = request.timeout
+    concurrency = request.concurrency
+    collapse_path_ids = request.collapse_path_ids
+    drop_random_query_values = request.drop_random_query_values
     
-    # Validate parameters
-    if not url:
-        raise HTTPException(status_code=400, detail="URL is required")
-    
-    # Validate URL
-    try:
-        parsed_url = urlparse(url)
-        if not parsed_url.scheme or not parsed_url.netloc:
-            raise HTTPException(status_code=400, detail="Invalid URL format")
-        
-        if parsed_url.scheme not in ['http', 'https']:
-            raise HTTPException(status_code=400, detail="URL must use HTTP or HTTPS protocol")
-    
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid URL: {str(e)}")
-    
-    async def generate_stream() -> Generator[str, None, None]:
+    async def generate_stream() -> AsyncGenerator[bytes, None]:
         """Generate SSE stream for real-time scraping results"""
         scraped_count = 0
         
-        def stream_callback(page_data):
-            nonlocal scraped_count
-            scraped_count += 1
-            
-            # Format the page data for streaming
-            event_data = {
-                "type": "page",
-                "data": page_data,
-                "progress": {
-                    "current": scraped_count,
-                    "total": max_pages,
-                    "percentage": min(100, (scraped_count / max_pages) * 100)
-                }
-            }
-            
-            return f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
-        
         try:
             # Send start event
-            start_event = {
-                "type": "start",
-                "message": "بدء عملية السكرابنج...",
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }
-            yield f"data: {json.dumps(start_event, ensure_ascii=False)}\n\n"
-            
-            # Initialize scraper with callback for streaming
-            scraper = WebScraper(url, timeout=timeout, max_pages=max_pages)
-            
-            # Store streamed results
-            streamed_results = []
+            yield STREAM_START_TEMPLATE % datetime.now(timezone.utc).isoformat().encode()
             
-            def capture_result(page_data):
-                streamed_results.append(page_data)
-                # Generate stream event
-                return stream_callback(page_data)
-            
-            scraper.callback = capture_result
-            
-            # Start crawling and stream results
-            urls_to_visit = [scraper.normalize_url(scraper.base_url)]
-            
-            while urls_to_visit and len(streamed_results) < max_pages:
-                current_url = urls_to_visit.pop(0)
-                
-                # Skip if already visited
-                if current_url in scraper.visited_urls:
-                    continue
-                
-                # Mark as visited
-                scraper.visited_urls.add(current_url)
-                
-                # Scrape the page
-                page_data = scraper.scrape_page(current_url)
-                if page_data:
-                    streamed_results.append(page_data)
-                    
-                    # Stream the result immediately
-                    event_data = {
-                        "type": "page",
-                        "data": page_data,
-                        "progress": {
-                            "current": len(streamed_results),
-                            "total": max_pages,
-                            "percentage": min(100, (len(streamed_results) / max_pages) * 100)
-                        }
-                    }
-                    yield f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
-                    
-                    # Extract links for next pages
-                    try:
-                        response = scraper.session.get(current_url, timeout=timeout)
-                        if response.status_code == 200 and 'text/html' in response.headers.get('content-type', '').lower():
-                            new_links = scraper.extract_links(response.text, current_url)
-                            
-                            # Add new links to visit queue
-                            for link in new_links:
-                                if link not in scraper.visited_urls and link not in urls_to_visit:
-                                    urls_to_visit.append(link)
-                    
-                    except Exception as e:
-                        logger.error(f"Error extracting links from {current_url}: {e}")
+            async with WebScraper(url, timeout=timeout, max_pages=max_pages, concurrency=concurrency,
+                                  collapse_path_ids=collapse_path_ids,
+                                  drop_random_query_values=drop_random_query_values,
+                                  connector=get_http_connector()) as scraper:
+                # Stream pages as soon as any crawl worker finishes them; pages that
+                # finished together are sent in one write
+                async with aclosing(scraper.crawl_batches()) as batches:
+                    async for batch in batches:
+                        frames = []
+                        for page_data in batch:
+                            scraped_count += 1
+                            event_data = {
+                                "type": "page",
+                                "data": page_data,
+                                "progress": {
+                                    "current": scraped_count,
+                                    "total": max_pages,
+                                    "percentage": min(100, (scraped_count / max_pages) * 100)
+                                }
+                            }
+                            frames.append(await encode_page_event(event_data))
+                        yield b"".join(frames)
                 
-                # Small delay to prevent overwhelming the client and reduce duplicate processing
-                await asyncio.sleep(0.2)
+                # Send completion event
+                complete_event = {
+                    "type": "complete",
+                    "message": f"تم الانتهاء! تم سكرابنج {scraped_count} صفحة",
+                    "total_pages": scraped_count,
+                    "timestamp": datetime.now(timezone.utc)
+                }
+                yield sse_event(complete_event)
             
-            # Send completion event
-            complete_event = {
-                "type": "complete",
-                "message": f"تم الانتهاء! تم سكرابنج {len(streamed_results)} صفحة",
-                "total_pages": len(streamed_results),
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }
-            yield f"data: {json.dumps(complete_event, ensure_ascii=False)}\n\n"
-        
         except Exception as e:
             logger.error(f"Error during streaming scrape: {e}")
             error_event = {
                 "type": "error",
                 "message": f"حدث خطأ: {str(e)}",
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "timestamp": datetime.now(timezone.utc)
             }
-            yield f"data: {json.dumps(error_event, ensure_ascii=False)}\n\n"
+            yield sse_event(error_event)
     
-    return StreamingResponse(
-        generate_stream(),
-        media_type="text/plain; charset=utf-8",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Content-Type": "text/event-stream",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, POST",
-            "Access-Control-Allow-Headers": "Content-Type"
-        }
-    )
+    # Frames are already encoded; EventSourceResponse passes bytes through and adds keep-alive pings
+    return EventSourceResponse(generate_stream(), ping=SSE_PING_INTERVAL, headers=SSE_HEADERS)
 
 @app.post("/scrape-stream-unlimited", 
         tags=["🚀 Unlimited Streaming"], 
@@ -799,141 +1324,86 @@ Returns streaming JSON responses with real-time updates.
 ```json
 {
     "url": "https://example.com",
-    "timeout": 10
+    "timeout": 10,
+    "concurrency": 10,
+    "collapse_path_ids": false,
+    "drop_random_query_values": false
 }
 ```
         """)
-async def scrape_stream_unlimited(request: dict):
-    
-    # Extract parameters from request
-    url = request.get('url')
-    timeout = request.get('timeout', 10)
+async def scrape_stream_unlimited(request: StreamScrapeRequest):
     
-    # Validate parameters
-    if not url:
-        raise HTTPException(status_code=400, detail="URL is required")
-    
-    # Validate URL
-    try:
-        parsed_url = urlparse(url)
-        if not parsed_url.scheme or not parsed_url.netloc:
-            raise HTTPException(status_code=400, detail="Invalid URL format")
-        
-        if parsed_url.scheme not in ['http', 'https']:
-            raise HTTPException(status_code=400, detail="URL must use HTTP or HTTPS protocol")
+    # The body model has already validated every field
+    url = str(request.url)
+    timeout = request.timeout
+    concurrency = request.concurrency
+    collapse_path_ids = request.collapse_path_ids
+    drop_random_query_values = request.drop_random_query_values
     
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid URL: {str(e)}")
-    
-    async def generate_unlimited_stream() -> Generator[str, None, None]:
+    async def generate_unlimited_stream() -> AsyncGenerator[bytes, None]:
         """Generate SSE stream for unlimited real-time scraping results"""
         scraped_count = 0
         
         try:
             # Send start event
-            start_event = {
-                "type": "start",
-                "message": "بدء عملية السكرابنج الشامل للموقع...",
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }
-            yield f"data: {json.dumps(start_event, ensure_ascii=False)}\n\n"
+            yield UNLIMITED_STREAM_START_TEMPLATE % datetime.now(timezone.utc).isoformat().encode()
             
             # Initialize scraper without page limit
-            scraper = WebScraper(url, timeout=timeout, max_pages=999999)
-            
-            # Store streamed results
-            streamed_results = []
-            
-            # Start crawling and stream results
-            urls_to_visit = [scraper.normalize_url(scraper.base_url)]
-            
-            while urls_to_visit:
-                current_url = urls_to_visit.pop(0)
-                
-                # Skip if already visited (with enhanced duplicate detection)
-                normalized_for_check = scraper.normalize_url_for_deduplication(current_url)
-                if normalized_for_check in scraper.visited_urls:
-                    continue
-                
-                # Mark as visited (using enhanced normalization)
-                scraper.visited_urls.add(normalized_for_check)
-                
-                # Scrape the page
-                page_data = scraper.scrape_page(current_url)
-                if page_data:
-                    scraped_count += 1
-                    streamed_results.append(page_data)
-                    
-                    # Stream the result immediately
-                    event_data = {
-                        "type": "page",
-                        "data": page_data,
-                        "progress": {
-                            "current": scraped_count,
-                            "total": "غير محدود",
-                            "percentage": None,
-                            "queue_size": len(urls_to_visit)
-                        }
-                    }
-                    yield f"data: {json.dumps(event_data, ensure_ascii=False)}\n\n"
-                    
-                    # Extract links for next pages
-                    try:
-                        response = scraper.session.get(current_url, timeout=timeout)
-                        if response.status_code == 200 and 'text/html' in response.headers.get('content-type', '').lower():
-                            new_links = scraper.extract_links(response.text, current_url)
+            async with WebScraper(url, timeout=timeout, max_pages=999999, concurrency=concurrency,
+                                  collapse_path_ids=collapse_path_ids,
+                                  drop_random_query_values=drop_random_query_values,
+                                  connector=get_http_connector()) as scraper:
+                # Stream pages as soon as any crawl worker finishes them; pages that
+                # finished together are sent in one write
+                async with aclosing(scraper.crawl_batches()) as batches:
+                    async for batch in batches:
+                        frames = []
+                        for page_data in batch:
+                            scraped_count += 1
                             
-                            # Add new links to visit queue
-                            for link in new_links:
-                                if link not in scraper.visited_urls and link not in urls_to_visit:
-                                    urls_to_visit.append(link)
-                    
-                    except Exception as e:
-                        logger.error(f"Error extracting links from {current_url}: {e}")
-                
-                # Small delay to prevent overwhelming the client
-                await asyncio.sleep(0.2)
+                            event_data = {
+                                "type": "page",
+                                "data": page_data,
+                                "progress": {
+                                    "current": scraped_count,
+                                    "total": "غير محدود",
+                                    "percentage": None,
+                                    "queue_size": scraper.queue_size
+                                }
+                            }
+                            frames.append(await encode_page_event(event_data))
+                            
+                            # Periodic heartbeat for very long crawls
+                            if scraped_count % 1000 == 0:
+                                progress_event = {
+                                    "type": "progress",
+                                    "message": f"تم استخراج {scraped_count} صفحة... استمرار العمل",
+                                    "current": scraped_count,
+                                    "timestamp": datetime.now(timezone.utc)
+                                }
+                                frames.append(sse_event(progress_event))
+                        yield b"".join(frames)
                 
-                # Enhanced URL validation to prevent duplicates and improve efficiency
-                if scraped_count > 0 and scraped_count % 1000 == 0:
-                    progress_event = {
-                        "type": "progress",
-                        "message": f"تم استخراج {scraped_count} صفحة... استمرار العمل",
-                        "current": scraped_count,
-                        "timestamp": datetime.now(timezone.utc).isoformat()
-                    }
-                    yield f"data: {json.dumps(progress_event, ensure_ascii=False)}\n\n"
+                # Send completion event
+                complete_event = {
+                    "type": "complete",
+                    "message": f"تم الانتهاء من السكرابنج الشامل! تم سكرابنج {scraped_count} صفحة",
+                    "total_pages": scraped_count,
+                    "timestamp": datetime.now(timezone.utc)
+                }
+                yield sse_event(complete_event)
             
-            # Send completion event
-            complete_event = {
-                "type": "complete",
-                "message": f"تم الانتهاء من السكرابنج الشامل! تم سكرابنج {scraped_count} صفحة",
-                "total_pages": scraped_count,
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }
-            yield f"data: {json.dumps(complete_event, ensure_ascii=False)}\n\n"
-        
         except Exception as e:
             logger.error(f"Error during unlimited streaming scrape: {e}")
             error_event = {
                 "type": "error",
                 "message": f"حدث خطأ: {str(e)}",
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "timestamp": datetime.now(timezone.utc)
             }
-            yield f"data: {json.dumps(error_event, ensure_ascii=False)}\n\n"
+            yield sse_event(error_event)
     
-    return StreamingResponse(
-        generate_unlimited_stream(),
-        media_type="text/plain; charset=utf-8",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Content-Type": "text/event-stream",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, POST",
-            "Access-Control-Allow-Headers": "Content-Type"
-        }
-    )
+    # Frames are already encoded; EventSourceResponse passes bytes through and adds keep-alive pings
+    return EventSourceResponse(generate_unlimited_stream(), ping=SSE_PING_INTERVAL, headers=SSE_HEADERS)
 
 @app.get("/database")
 async def database_page():
@@ -961,5 +1431,8 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=5000,
         reload=True,
+        # "auto" picks uvloop and httptools when installed (both are dependencies), else asyncio and h11
+        loop="auto",
+        http="auto",
         log_level="info"
     )